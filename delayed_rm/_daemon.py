@@ -0,0 +1,122 @@
+"""
+The delayed deletion daemon
+This is run as a standalone script, so it must only import from the standard library
+Keep imports minimal, they are paid for on every daemon startup
+"""
+
+import signal
+import shutil
+import time
+import sys
+import os
+
+
+#
+# Classes
+#
+
+
+class Secret:
+    """
+    Contains a string needed to activate the secret CLI
+    Users should *not* use this, it is an internal class!
+    """
+
+    key: str = "DELAYED_RM_SECRET_CLI"
+    value: str = "--:://'cL5r0!L4hmWmonW7k^RZM*4nq7mR&yfF"
+    key_b: bytes = key.encode()
+    value_b: bytes = value.encode()
+
+
+#
+# Functions
+#
+
+
+def _has_secret_env() -> bool:
+    """
+    :return: True if the environment contains the secret; avoids decoding the environment where possible
+    """
+    if os.supports_bytes_environ:
+        return os.environb.get(Secret.key_b, None) == Secret.value_b
+    return os.environ.get(Secret.key, None) == Secret.value
+
+
+def append(log: str, msg: bytes) -> None:
+    """
+    Append msg to the log file via a single write
+    Not durable, matching the foreground log writes in delayed_rm._log
+    If durability is ever needed it may be added here, the daemon's writes do not block rm
+    """
+    fd = os.open(log, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, msg)
+    finally:
+        os.close(fd)
+
+
+def rmtree(d: str) -> None:
+    """
+    Recursively delete d; rm -rf is faster than shutil.rmtree on large trees
+    Falls back to shutil.rmtree if rm is unavailable or fails
+    """
+    try:
+        if os.spawnv(os.P_WAIT, "/bin/rm", ("/bin/rm", "-rf", "--", d)) == 0:  # nosec B606
+            return
+    except OSError:
+        pass
+    if os.path.lexists(d):  # rm may have succeeded without its exit status being known
+        shutil.rmtree(d)
+
+
+def default_sigchld() -> None:
+    """
+    Restore the default SIGCHLD handler, which may have been inherited as ignored from the caller
+    If it is ignored children are reaped automatically, and waiting on rm fails with ChildProcessError
+    """
+    if hasattr(signal, "SIGCHLD"):
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+
+
+def deprioritize() -> None:
+    """
+    Lower the priority of this process; the daemon is not latency sensitive
+    so a large deletion should not compete with the user for CPU
+    """
+    if hasattr(os, "nice"):
+        try:
+            os.nice(19)
+        except OSError:
+            pass
+
+
+def delayed_rmtree(delay: int, d: str, log: str) -> None:
+    """
+    Sleep for delay seconds then delete d and log it
+    """
+    time.sleep(delay)
+    rmtree(d)
+    append(log, f"Removing: {d}\n\n".encode())
+
+
+def main() -> None:
+    """
+    This CLI will only activate if argv was intentionally configured to do so
+    This entrypoint is for the spawned process to act
+    """
+    if len(sys.argv) != 5 or sys.argv[1] != Secret.value or not _has_secret_env():
+        return
+    log = sys.argv[4]
+    default_sigchld()
+    deprioritize()
+    try:
+        delayed_rmtree(int(sys.argv[2]), os.path.realpath(sys.argv[3]), log)
+    except Exception:
+        sys.stderr = open(log, "a", encoding="utf-8")  # pylint: disable=consider-using-with
+        sys.stdout = sys.stderr
+        print(f"argv: {sys.argv}", flush=True)
+        raise
+
+
+if __name__ == "__main__":
+    main()
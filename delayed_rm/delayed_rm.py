@@ -1,16 +1,23 @@
-from collections.abc import Callable
 from collections import defaultdict
 from tempfile import gettempdir
 from datetime import datetime
 from pathlib import Path
-from os import environ
+from typing import TYPE_CHECKING, Any
 import subprocess
-import argparse
+import traceback
+import functools
+import threading
 import tempfile
 import shutil
-import math
-import time
+import errno
+import stat
 import sys
+import os
+
+from . import _daemon
+
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor, Future
 
 
 __version__ = "2.10.0"
@@ -23,6 +30,28 @@ __version__ = "2.10.0"
 
 log_f: Path = Path.home().resolve() / ".delayed_rm.log"
 tmp_d: Path = Path(gettempdir()).resolve() / ".delayed_rm"
+# Lazily opened by _get_log_fd and reused for log writes while log_f still refers to the same file
+_log_fd: int | None = None
+_log_id: tuple[int, int] = (0, 0)  # The (st_dev, st_ino) of _log_fd
+
+# Devices copy_file_range failed to copy from; _kernel_copy uses sendfile for these instead
+_no_copy_file_range: set[int] = set()
+# Linux's sendfile can copy between regular files, as shutil also relies on
+_sendfile: bool = hasattr(os, "sendfile") and sys.platform.startswith("linux")
+# Bytes copied per in-kernel copy step; bounds how long an interrupted copy takes to stop
+_chunk: int = 1 << 26
+
+# pids of daemons started via posix_spawn, which _spawn_daemon reaps once they have exited
+_spawned: list[int] = []
+
+# Flags understood by _fast_parse, and the arguments each sets
+_flags: dict[str, tuple[str, ...]] = {
+    "-r": ("r",),
+    "-f": ("f",),
+    "-rf": ("r", "f"),
+    "-fr": ("r", "f"),
+    "--log": ("log",),
+}
 
 
 #
@@ -37,16 +66,6 @@ class RMError(Exception):
     """
 
 
-class _Secret:
-    """
-    Contains a string needed to activate the secret CLI
-    Users should *not* use this, it is an internal class!
-    """
-
-    key: str = "DELAYED_RM_SECRET_CLI"
-    value: str = "--:://'cL5r0!L4hmWmonW7k^RZM*4nq7mR&yfF"
-
-
 #
 # Functions
 #
@@ -57,8 +76,8 @@ def _size(p: Path) -> str:
     Get file size as a human readable string
     """
     s = p.stat().st_size
-    lg = int(math.log(s, 1000))
-    si = " KMGT"[lg].replace(" ", "")
+    lg = sum(s >= i for i in (10**3, 10**6, 10**9, 10**12))
+    si = "KMGT"[lg - 1] if lg else ""
     return f"{round(s/(1000**lg))} {si}B"
 
 
@@ -77,43 +96,225 @@ def _eprint(e: str | BaseException) -> None:
     print(f"{err}: {e}", file=sys.stderr)
 
 
-def _mkdir(ret: Path) -> Path:
+def _mkdir(ret: str) -> str:
     """
-    Make base/name and set permissions to 700
+    Make base/name with permissions 700
     """
-    ret.mkdir()
-    ret.chmod(0o700)
+    os.mkdir(ret, 0o700)
     return ret
 
 
-def _prep(paths: list[Path], rf: bool) -> list[Path]:
+def _get_log_fd() -> int:
     """
-    Normalize paths, error check, and prep temp items
-    :return: A normalized list of paths
+    :return: An fd for the log file opened in append mode, creating the log if needed
+    The fd is cached, it is reopened if log_f has since been removed or replaced (e.g. rotated)
+    O_APPEND makes each write atomic on POSIX, so no locking is needed
+    """
+    global _log_fd, _log_id  # pylint: disable=global-statement
+    log_s: str = os.fspath(log_f)
+    try:
+        st = os.lstat(log_s)
+        if not stat.S_ISREG(st.st_mode):
+            raise RMError(f"{log_f} is not a file.")
+        if _log_fd is not None and (st.st_dev, st.st_ino) == _log_id:
+            return _log_fd
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        raise RMError(f"Could not stat {log_f}: {e}") from e
+    if _log_fd is not None:
+        os.close(_log_fd)
+        _log_fd = None
+    # O_NOFOLLOW and O_NONBLOCK so that if log_f is swapped after the lstat, open neither follows a link nor hangs
+    # These are POSIX only, without them (i.e. on Windows) the lstat and fstat checks still apply
+    flags = getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_NONBLOCK", 0) | getattr(os, "O_CLOEXEC", 0)
+    try:
+        fd = os.open(log_s, os.O_WRONLY | os.O_APPEND | os.O_CREAT | flags, 0o600)
+    except OSError as e:
+        raise RMError(f"Could not open {log_f}: {e}") from e
+    st = os.fstat(fd)
+    if not stat.S_ISREG(st.st_mode):
+        os.close(fd)
+        raise RMError(f"{log_f} is not a file.")
+    _log_fd, _log_id = fd, (st.st_dev, st.st_ino)
+    return fd
+
+
+def _log(msg: bytes) -> None:
+    """
+    Append msg to the log file via a single write
+    This is deliberately not durable (no fsync, O_SYNC, or O_DSYNC); the log is best-effort
+    Never add durability here, this write is in the foreground so rm would block on the disk
+    """
+    os.write(_get_log_fd(), msg)
+
+
+def _mk_tmp_d() -> None:
+    """
+    Create tmp_d if it does not exist
+    """
+    try:
+        tmp_d.mkdir(exist_ok=True)
+    except (OSError, FileExistsError) as e:
+        raise RMError(f"Could not create directory and set permissions on {tmp_d}") from e
+
+
+@functools.cache
+def _ensure_infra() -> None:
+    """
+    Verify the log file and tmp_d exist, creating them if needed
+    This is cached as these rarely change within a process; failures raise and thus are not cached
+    """
+    if not tmp_d.parent.exists():
+        raise RuntimeError("Temp dir enclosing directory does not exist")
+    if not log_f.parent.exists():
+        raise RuntimeError("Log file enclosing directory does not exist")
+    _get_log_fd()  # Creates the log file if needed and verifies it is a regular file
+    _mk_tmp_d()
+
+
+def _kernel_copy(sfd: int, dfd: int, st: os.stat_result, stop: threading.Event) -> bool:
+    """
+    Copy the regular file sfd, whose lstat is st, to dfd in-kernel in _chunk sized steps
+    Uses copy_file_range where the two filesystems support it, else sendfile on Linux
+    Raises KeyboardInterrupt between steps once stop is set
+    :return: True if all of sfd was copied, False if it could not be, in which case dfd should be discarded
+    """
+    cfr: bool = hasattr(os, "copy_file_range") and st.st_dev not in _no_copy_file_range
+    n: int = 0
+    while cfr or _sendfile:
+        if stop.is_set():
+            raise KeyboardInterrupt
+        try:
+            k: int = os.copy_file_range(sfd, dfd, _chunk) if cfr else os.sendfile(dfd, sfd, None, _chunk)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+            if not cfr or n:
+                return False
+            _no_copy_file_range.add(st.st_dev)
+            cfr = False
+            continue
+        if k == 0:
+            return n == st.st_size  # Some filesystems return 0 or copy short rather than erroring
+        n += k
+    return False
+
+
+def _copy(src: str, dst: str, stop: threading.Event) -> str:
+    """
+    shutil.copy2 without following symlinks
+    Regular files are copied in-kernel by _kernel_copy where possible, so the copy stops soon after stop is set
+    :return: dst
+    """
+    if stop.is_set():
+        raise KeyboardInterrupt
+    st = os.lstat(src)
+    if stat.S_ISREG(st.st_mode) and (_sendfile or hasattr(os, "copy_file_range")):
+        sfd = os.open(src, os.O_RDONLY)
+        try:
+            dfd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            try:
+                copied = _kernel_copy(sfd, dfd, st, stop)
+            finally:
+                os.close(dfd)
+        finally:
+            os.close(sfd)
+        if copied:
+            shutil.copystat(src, dst, follow_symlinks=False)
+            return dst
+        os.unlink(dst)
+    return shutil.copy2(src, dst, follow_symlinks=False)
+
+
+def _copy_move(src: str, dst: str, is_dir: bool, copied: list[str], stop: threading.Event) -> None:
+    """
+    Move src to dst by copying it then deleting the original
+    Used when src and dst are on different devices
+    dst is appended to copied once the copy completes, from then on it may hold the only copy of src
+    Once stop is set the copy is abandoned at its next file or chunk by raising KeyboardInterrupt
+    """
+    # Hard links cannot cross devices either, so the data must be copied
+    if is_dir:
+        shutil.copytree(src, dst, copy_function=functools.partial(_copy, stop=stop), symlinks=False)
+        copied.append(dst)
+        shutil.rmtree(src)
+    else:
+        _copy(src, dst, stop)
+        copied.append(dst)
+        os.unlink(src)
+
+
+def _join(copier: "ThreadPoolExecutor", futures: "list[Future[None]]", stop: threading.Event) -> None:
+    """
+    Wait for the copies futures of copier to finish then shut copier down, stop is set if interrupted
+    On SIGINT copies which have not started are cancelled and running ones stop at their next file or chunk
+    Further SIGINTs only repeat this, the copies must be joined so that every moved item is logged
+    This waits on the futures rather than joining threads, as an interrupted Thread.join may not be retried
+    """
+    from concurrent.futures import wait  # pylint: disable=import-outside-toplevel
+
+    while True:
+        try:
+            if stop.is_set():
+                for i in futures:
+                    i.cancel()
+            wait(futures)
+            copier.shutdown()  # The workers are idle, so this only waits for them to exit
+            return
+        except KeyboardInterrupt:
+            stop.set()
+
+
+def _copier(workers: int) -> "ThreadPoolExecutor":
+    """
+    Make a thread pool for running _copy_move
+    concurrent.futures is imported lazily as it is only needed in the rare cross-device case
+    """
+    from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _mkdtemp() -> Path:
+    """
+    Make a new storage directory in tmp_d, recreating tmp_d if it has been removed
+    """
+    d: str = os.fspath(tmp_d)
+    try:
+        return Path(tempfile.mkdtemp(dir=d))
+    except FileNotFoundError:
+        _mk_tmp_d()
+        return Path(tempfile.mkdtemp(dir=d))
+
+
+def _prep(paths: list[Path], rf: bool) -> list[tuple[Path, os.stat_result]]:
+    """
+    Normalize paths and error check
+    :return: A normalized list of (path, lstat result) pairs, sorted by device and inode
     """
     # Normalize paths and error checking
+    stats: list[os.stat_result] = []
+    seen: set[tuple[int, int]] = set()
     try:
         paths = [i.parent.resolve(strict=True) / i.name for i in paths]
-        if len(paths) != len({i.stat(follow_symlinks=False).st_ino for i in paths}):
-            raise RMError("duplicate or hardlinked items passed")
+        for i in paths:
+            st = os.lstat(i)
+            if (st.st_dev, st.st_ino) in seen:
+                raise RMError("duplicate or hardlinked items passed")
+            seen.add((st.st_dev, st.st_ino))
+            stats.append(st)
     except (FileNotFoundError, RuntimeError) as e:
         raise RMError(e) from e
-    for i in paths:
-        if not rf and not i.is_symlink() and i.is_dir():
+    for i, st in zip(paths, stats):
+        if not rf and stat.S_ISDIR(st.st_mode):
             raise RMError(f"{i} is a directory. -rf required!")
         if tmp_d == i:
             raise RMError(f"Will not delete {tmp_d}")
         if tmp_d in i.parents:
             raise RMError(f"Will not delete items within {tmp_d}")
-    # Prep temp items
-    log_f.touch()
-    if log_f.is_symlink() or not log_f.is_file():
-        raise RMError(f"{log_f} is not a file.")
-    try:
-        tmp_d.mkdir(exist_ok=True)
-    except (OSError, FileExistsError) as e:
-        raise RMError(f"Could not create directory and set permissions on {tmp_d}") from e
-    return paths
+    # Process items in (device, inode) order for more sequential disk access
+    return sorted(zip(paths, stats), key=lambda x: (x[1].st_dev, x[1].st_ino))
 
 
 def delayed_rm(paths: list[Path], delay: int, rf: bool) -> bool:
@@ -124,93 +325,103 @@ def delayed_rm(paths: list[Path], delay: int, rf: bool) -> bool:
     May raise an RMError if something goes wrong
     :returns: True on success, else False
     """
-    if not tmp_d.parent.exists():
-        raise RuntimeError("Temp dir enclosing directory does not exist")
-    if not log_f.parent.exists():
-        raise RuntimeError("Log file enclosing directory does not exist")
     # Prep
-    paths = _prep(paths, rf)
-    base = Path(tempfile.mkdtemp(dir=tmp_d))
-    base.chmod(0o700)
+    _ensure_infra()
+    items = _prep(paths, rf)
+    base = _mkdtemp()  # mkdtemp creates base with permissions 700
+    # The i-th item of a given name is stored in output directory i, which is created on first use
+    base_s: str = os.fspath(base)
+    out_dirs: list[str] = []
+    if len(items) == 1:  # A lone item cannot collide with anything, so store it directly in base
+        out_dirs.append(base_s)
+    name_count: dict[str, int] = defaultdict(int)
     # Init data structures
-    success: list[Path] = []
-    failed: list[Path] = []
-    out_dirs: set[Path] = {_mkdir(base / "0")}
-    where: dict[str, set[Path]] = defaultdict(set)
-    full_where: dict[Path, Path] = {}
-    # Delete files
-    ctrlc = False
+    success: list[str] = []
+    stored: list[str] = []  # Where each item of success was moved to
+    failed: list[str] = []
+    # Delete files; renames are done inline, cross-device copies are run concurrently
+    copier: ThreadPoolExecutor | None = None
+    copies: list[tuple[str, str, Future[None]]] = []
+    copied: list[str] = []  # Appended to by the copies as they complete
+    stop = threading.Event()  # Set on SIGINT, stops the copies
     edited = False
     try:
-        for p in paths:
+        for p, st in items:
             # Select an output directory that an item of name p.name does not exist
-            outd: Path
-            if len(out_dirs) != len(where[p.name]):
-                outd = next(iter(out_dirs - where[p.name]))
-            else:
-                outd = _mkdir(base / str(len(out_dirs)))
-                out_dirs.add(outd)
+            name: str = p.name
+            idx: int = name_count[name]
+            name_count[name] += 1
+            if idx == len(out_dirs):
+                out_dirs.append(_mkdir(f"{base_s}/{idx}"))
             # Move file into the temp directory
+            src: str = os.fspath(p)
+            new: str = f"{out_dirs[idx]}/{name}"
             try:
-                new: Path = outd / p.name
-                try:
-                    p.rename(new)
-                    edited = True
-                except OSError:
-                    copyf = lambda src, dst: shutil.copy2(src, dst, follow_symlinks=False)
-                    if p.is_dir():
-                        shutil.copytree(p, new, copy_function=copyf, symlinks=False)
-                        edited = True
-                        shutil.rmtree(p)
-                    else:
-                        copyf(p, new)
-                        edited = True
-                        p.unlink()
-                success.append(p)
-                full_where[p] = new
-                where[p.name].add(outd)
+                os.rename(src, new)
+                edited = True
+                success.append(src)
+                stored.append(new)
             except OSError as e:
-                failed.append(p)
-                _eprint(e)
+                if e.errno != errno.EXDEV:
+                    failed.append(src)
+                    _eprint(e)
+                    continue
+                if copier is None:
+                    copier = _copier(min(8, len(items)))
+                copies.append((src, new, copier.submit(_copy_move, src, new, stat.S_ISDIR(st.st_mode), copied, stop)))
     except KeyboardInterrupt:
-        ctrlc = True
+        stop.set()
+    if copier is not None:
+        _join(copier, [i for _, _, i in copies], stop)
+    ctrlc: bool = stop.is_set()
+    for src, new, copy in copies:
+        if not copy.cancelled():
+            if (err := copy.exception()) is None:
+                success.append(src)
+                stored.append(new)
+            elif not isinstance(err, KeyboardInterrupt):  # Interrupted copies are left in place, like cancelled ones
+                failed.append(src)
+                _eprint(err)
+    edited = edited or bool(copied)
     # Inform user of failures
-    failed_plus: list[str] = [str(i) for i in failed]
     if len(failed) > 0 and not ctrlc:
-        _eprint("failed to rm:\n  " + "\n  ".join(failed_plus))
-    # Log result
-    success_plus: list[str] = [f"{i}  --->  {full_where[i]}" for i in success]
-    fmt: Callable[[list[str]], str] = lambda l: ("\n  " + "\n  ".join(l)) if l else " None"
-    msg: str = (
-        str(datetime.now())
-        + "\n  "
-        + "\n".join(
-            (
-                ("Interrupted by: SIGINT\n" if ctrlc else "") + f"Delay: {delay}",
-                f"rf: {rf}",
-                f"Storage Directory: {base}",
-                f"Succeeded:{fmt(success_plus)}",
-                f"Failed:{fmt(failed_plus)}",
-            )
-        ).replace("\n", "\n  ")
-        + "\n\n"
-    )
+        _eprint("failed to rm:\n  " + "\n  ".join(failed))
+    # Log result; this must happen before returning, the log is how users find and recover their items
+    # Each entry is indented as it is written, rather than re-indenting the whole message after
+    lines: list[str] = [str(datetime.now())]
+    if ctrlc:
+        lines.append("  Interrupted by: SIGINT")
+    lines += (f"  Delay: {delay}", f"  rf: {rf}", f"  Storage Directory: {base}")
+    lines.append("  Succeeded:" if success else "  Succeeded: None")
+    lines += (f"    {i}  --->  {j}" for i, j in zip(success, stored))
+    lines.append("  Failed:" if failed else "  Failed: None")
+    lines += (f"    {i}" for i in failed)
+    msg: str = "\n".join(lines) + "\n\n"
     try:
-        with log_f.open("a") as f:
-            f.write(msg)
-    except OSError:
+        _log(msg.encode("utf-8"))
+    except (OSError, RMError):
         print(msg)
         raise
     # Delay rm and die
     if not edited:
-        shutil.rmtree(base)
+        # Nothing was moved into base, so it should only hold empty output directories
+        try:
+            for i in out_dirs:
+                if i != base_s:
+                    os.rmdir(i)
+            os.rmdir(base_s)
+        except OSError:  # A failed copy may have left partial data behind
+            # Where supported, rmtree is fd based (scandir + unlinkat), see rmtree.avoids_symlink_attacks
+            shutil.rmtree(base)
+    elif delay == 0:
+        # shutil.rmtree as _daemon.rmtree forks to run rm, which is unsafe if the caller has threads
+        try:
+            shutil.rmtree(base)
+        except OSError as e:
+            raise RMError(f"Failed to delete {base}: {e}") from e
+        _log(f"Removing: {base_s}\n\n".encode())
     else:
-        subprocess.Popen(  # pylint: disable=consider-using-with # nosec B603
-            (sys.executable, __file__, _Secret.value, str(delay), base),
-            env={_Secret.key: _Secret.value},
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
+        _spawn_daemon(delay, base)
     return not failed and not ctrlc
 
 
@@ -240,20 +451,60 @@ def delayed_rm_raw(delay: int, log: bool, r: bool, f: bool, paths: list[Path]) -
     return True
 
 
+def _fast_parse(argv: list[str]) -> dict[str, Any] | None:
+    """
+    Parse the common forms of CLI arguments without the cost of argparse
+    :return: The arguments as argparse would parse them, or None if argparse is needed
+    """
+    ret: dict[str, Any] = {"delay": 900, "log": False, "r": False, "f": False}
+    paths: list[str] = []
+    closed = False  # argparse does not accept more paths once an option follows them
+    args = iter(argv)
+    for i in args:
+        if i == "--":
+            if closed:  # argparse rejects this even if nothing follows the --
+                return None
+            paths += args
+        elif not i.startswith("-"):
+            if closed:
+                return None
+            paths.append(i)
+        elif i in _flags:
+            closed = bool(paths)
+            ret.update(dict.fromkeys(_flags[i], True))
+        else:
+            closed = bool(paths)
+            opt, eq, value = i.partition("=")
+            if opt not in ("--delay", "--ttl"):
+                return None
+            if not eq:
+                value = next(args, "")
+            try:
+                ret["delay"] = int(value)
+            except ValueError:
+                return None
+    ret["paths"] = [Path(i) for i in paths]
+    return ret
+
+
 def cli() -> None:
     """
     delayed_rm CLI
     """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--version", action="version", version=f"{parser.prog} {__version__}")
-    parser.add_argument("--delay", "--ttl", type=int, default=900, help="The deletion delay in seconds")
-    parser.add_argument(
-        "--log", action="store_true", help=f"Show {parser.prog}'s log files; may not be used with other arguments"
-    )
-    parser.add_argument("-r", action="store_true", help="rm -r; must use -f with this")
-    parser.add_argument("-f", action="store_true", help="rm -f; must use -r with this")
-    parser.add_argument("paths", type=Path, nargs="*", help="The items to delete")
-    sys.exit(not delayed_rm_raw(**vars(parser.parse_args())))
+    if (args := _fast_parse(sys.argv[1:])) is None:
+        import argparse  # pylint: disable=import-outside-toplevel
+
+        parser = argparse.ArgumentParser()
+        parser.add_argument("--version", action="version", version=f"{parser.prog} {__version__}")
+        parser.add_argument("--delay", "--ttl", type=int, default=900, help="The deletion delay in seconds")
+        parser.add_argument(
+            "--log", action="store_true", help=f"Show {parser.prog}'s log files; may not be used with other arguments"
+        )
+        parser.add_argument("-r", action="store_true", help="rm -r; must use -f with this")
+        parser.add_argument("-f", action="store_true", help="rm -f; must use -r with this")
+        parser.add_argument("paths", type=Path, nargs="*", help="The items to delete")
+        args = vars(parser.parse_args())
+    sys.exit(not delayed_rm_raw(**args))
 
 
 #
@@ -261,27 +512,61 @@ def cli() -> None:
 #
 
 
-def _secret_cli():
+def _reap(pid: int) -> bool:
     """
-    This CLI is invoked on import and not will do nothing by default
-    This CLI will only activate if argv was intentionally configured to do so
-    This entrypoint is for the spawned process to act
+    Reap the child pid if it has exited
+    :return: True if pid has exited, else False
     """
     try:
-        if len(sys.argv) == 4 and sys.argv[1] == _Secret.value:
-            if environ.get(_Secret.key, None) == _Secret.value:
-                delay = int(sys.argv[2])
-                d = Path(sys.argv[3]).resolve()
-                time.sleep(delay)
-                shutil.rmtree(d)
-                with log_f.open("a") as f:
-                    f.write(f"Removing: {d}" + "\n\n")
-    except Exception:
-        sys.stderr = log_f.open("a")
-        sys.stdout = sys.stderr
-        print(f"argv: {sys.argv}", flush=True)
-        raise
+        return os.waitpid(pid, os.WNOHANG)[0] != 0
+    except ChildProcessError:  # Already reaped, e.g. SIGCHLD is ignored
+        return True
 
 
-if __name__ == "__main__":
-    _secret_cli()
+def _spawn_daemon(delay: int, d: Path) -> None:
+    """
+    Start a background process which will delete d after delay seconds
+    Where possible this forks, avoiding the startup cost of a new interpreter
+    Forking a multi-threaded process is unsafe though, so then a fresh daemon is spawned
+    Either way the daemon is put in a new session so the terminal's SIGINT and SIGHUP do not reach it
+    """
+    log_s: str = os.fspath(log_f)
+    if not hasattr(os, "fork") or threading.active_count() > 1:
+        # -S -I: skip site and the environment, the daemon only needs the standard library
+        argv = [sys.executable, "-S", "-I", _daemon.__file__, _daemon.Secret.value, str(delay), str(d), log_s]
+        env = {_daemon.Secret.key: _daemon.Secret.value}
+        if hasattr(os, "posix_spawn"):  # Avoids fork's copy of the parent
+            # Like subprocess does for dropped Popen objects, reap earlier daemons that have since exited
+            _spawned[:] = [i for i in _spawned if not _reap(i)]
+            io = [(os.POSIX_SPAWN_OPEN, i, os.devnull, os.O_RDWR, 0) for i in range(3)]
+            _spawned.append(os.posix_spawn(sys.executable, argv, env, file_actions=io, setsid=True))
+        else:
+            subprocess.Popen(  # pylint: disable=consider-using-with # nosec B603
+                argv, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True
+            )
+        return
+    if (pid := os.fork()) != 0:
+        try:  # The intermediate child exits at once; the daemon is reparented so it need not be reaped
+            os.waitpid(pid, 0)
+        except ChildProcessError:  # Already reaped, e.g. SIGCHLD is ignored
+            pass
+        return
+    # Child: detach from the terminal's session then fork the daemon and exit
+    try:
+        os.setsid()
+        if os.fork() == 0:
+            # Daemon: detach from the caller's cwd and fds, stdout and stderr go to the log so errors are recorded
+            os.chdir("/")
+            os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+            out = os.open(log_s, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            os.dup2(out, 1)
+            os.dup2(out, 2)
+            os.closerange(3, os.sysconf("SC_OPEN_MAX"))
+            _daemon.default_sigchld()
+            _daemon.deprioritize()
+            _daemon.delayed_rmtree(delay, os.fspath(d), log_s)
+    except BaseException:  # pylint: disable=broad-exception-caught
+        traceback.print_exc()
+        sys.stderr.flush()
+    finally:
+        os._exit(0)